@@ -3,13 +3,41 @@
 
 import re
 import os
+import copy
+import hashlib
+import functools
+from collections import OrderedDict
 from typing import List, Dict, Optional, Tuple
 from difflib import SequenceMatcher
 
-# ----------------------------- Fuzzy Matching (keep as-is) -----------------------------
+import yaml
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without LibYAML
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    from rapidfuzz import fuzz as _rf_fuzz, process as _rf_process
+except ImportError:  # fall back to the pure-Python difflib scorers below
+    _rf_fuzz = _rf_process = None
+
+try:
+    import ahocorasick
+except ImportError:  # keyword buckets fall back to per-word substring scans
+    ahocorasick = None
+
+# ----------------------------- Fuzzy Matching -----------------------------
+
+@functools.lru_cache(maxsize=8192)
+def _fuzz_ratio_cached(s1: str, s2: str) -> int:
+    return int(SequenceMatcher(None, s1, s2).ratio() * 100)
 
 def fuzz_ratio(s1: str, s2: str) -> int:
-    return int(SequenceMatcher(None, s1.lower(), s2.lower()).ratio() * 100)
+    s1, s2 = s1.lower(), s2.lower()
+    if _rf_fuzz is not None:
+        return int(_rf_fuzz.ratio(s1, s2))
+    return _fuzz_ratio_cached(s1, s2)
 
 def fuzz_partial_ratio(s1: str, s2: str) -> int:
     s1, s2 = s1.lower(), s2.lower()
@@ -17,16 +45,32 @@ def fuzz_partial_ratio(s1: str, s2: str) -> int:
         s1, s2 = s2, s1
     if not s1:
         return 0
+    if _rf_fuzz is not None:
+        return int(_rf_fuzz.partial_ratio(s1, s2))
+    # Keep the shorter string as seq2 so its b2j table is built once and
+    # reused for every window instead of once per window.
+    sm = SequenceMatcher(None, autojunk=False)
+    sm.set_seq2(s1)
     max_ratio = 0
     for i in range(len(s2) - len(s1) + 1):
-        substr = s2[i:i+len(s1)]
-        ratio = fuzz_ratio(s1, substr)
-        max_ratio = max(max_ratio, ratio)
+        sm.set_seq1(s2[i:i+len(s1)])
+        # quick_ratio() is a cheap upper bound on ratio(); skip windows that can't win
+        if int(sm.quick_ratio() * 100) <= max_ratio:
+            continue
+        max_ratio = max(max_ratio, int(sm.ratio() * 100))
+        if max_ratio == 100:
+            break
     return max_ratio
 
 def process_extract(query: str, choices: List[str], limit: int = 5) -> List[Tuple[str, int]]:
+    # RapidFuzz's partial_ratio scores differently from the difflib fallback,
+    # so the ranking -- including the top match -- can differ between the two
     if not choices:
         return []
+    if _rf_process is not None:
+        matches = _rf_process.extract(query, choices, scorer=_rf_fuzz.partial_ratio,
+                                      processor=str.lower, limit=limit)
+        return [(choice, int(score)) for choice, score, _ in matches]
     scored = []
     for choice in choices:
         score = fuzz_partial_ratio(query, choice)
@@ -36,12 +80,30 @@ def process_extract(query: str, choices: List[str], limit: int = 5) -> List[Tupl
 
 # ----------------------------- Config Loading -----------------------------
 
+# Parsed YAML keyed by absolute path, validated against (mtime, size)
+_YAML_CACHE: "OrderedDict[str, Tuple[int, int, dict]]" = OrderedDict()
+_YAML_CACHE_SIZE = 16
+
 def _load_yaml_file(filepath: str) -> dict:
-    if not os.path.exists(filepath):
+    key = os.path.abspath(filepath)
+    try:
+        st = os.stat(key)
+    except FileNotFoundError:
         return {}
-    with open(filepath, 'r', encoding='utf-8') as f:
-        import yaml
-        return yaml.safe_load(f)
+    entry = _YAML_CACHE.get(key)
+    if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+        _YAML_CACHE.move_to_end(key)
+        return copy.deepcopy(entry[2])
+    # Bytes go straight to LibYAML, which handles the UTF-8/BOM decoding itself
+    try:
+        with open(key, 'rb') as f:
+            data = yaml.load(f, Loader=_YamlLoader)
+    except FileNotFoundError:  # removed since the stat
+        return {}
+    _YAML_CACHE[key] = (st.st_mtime_ns, st.st_size, data)
+    if len(_YAML_CACHE) > _YAML_CACHE_SIZE:
+        _YAML_CACHE.popitem(last=False)
+    return copy.deepcopy(data)
 
 def _init_data():
     global BENEFITS_DATA, INGREDIENTS_DATA
@@ -59,28 +121,115 @@ BENEFITS_DATA = {}
 INGREDIENTS_DATA = []
 _init_data()
 
+# ----------------------------- Compiled Patterns -----------------------------
+
+_WS_RE = re.compile(r'\s+')
+# Matches on raw text, so any whitespace run may separate the words
+_FDA_RE = re.compile(r"The\s+U\.S\.\s+Food\s+and\s+Drug\s+Administration.*", re.I | re.DOTALL)
+_SENT_SPLIT_RE = re.compile(r'[.!?]+')
+# Runs between sentence terminators long enough to survive the >20 char filter
+_SENT_RUN_RE = re.compile(r'[^.!?]{21,}')
+
+# Abbreviations whose trailing period must not end a sentence
+_ABBREVS = ('Dr', 'Mr', 'Mrs', 'Ms', 'Ph', 'B', 'D', 'O', 'U', 'S', 'vs', 'etc', 'i.e', 'e.g')
+_ABBREV_RE = re.compile(r'\b(' + '|'.join(re.escape(a) for a in _ABBREVS) + r')\.', re.I)
+
+_DELIVERS_RE = re.compile(r"delivers\s+([\w\s]+?)\s+(?:through|via)", re.I)
+_PROVIDES_RE = re.compile(r"provides?\s+([\w\s]+?)\s+(?:for|through|via)", re.I)
+_CLINICAL_APPS_RE = re.compile(r"clinical applications?:(.*?)(?:\n\n|\Z)", re.I | re.DOTALL)
+_CLINICAL_SECTION_RE = re.compile(r"clinical (?:applications?|considerations?):(.*?)(?:\n\n|\Z)", re.I | re.DOTALL)
+_BULLET_RE = re.compile(r'[•\-]\s*(.+?)(?:\n|$)')
+
+_HEADER_STRIP_RE = re.compile(r'^(?:[A-Z][a-z]+\s+){1,4}(?=[a-z])')
+_THE_STRIP_RE = re.compile(r'^.*?\s+The\s+')
+_MECH_LEAD_RE = re.compile(r'^(?:The combination of|The formula)\s+', re.I)
+
+# Keyword buckets used to score mechanism sentences
+_KILL_SHOTS = ('this product is not intended', 'not intended to diagnose', 'food and drug administration',
+               'product specifications', 'formulation details', 'dosing protocols', 'dosing protocol',
+               'clinical guide', 'product profile')
+_HIGH_VERBS = ('accumulate', 'block', 'prevent', 'protect', 'reduce', 'inhibit', 'modulate', 'addresses')
+_BIO_TERMS = ('cellular', 'mitochondrial', 'oxidative', 'retinal', 'macular', 'fovea', 'pigment',
+              'neurotransmitter', 'enzyme', 'proteolytic', 'inflammatory', 'adrenal', 'hpa', 'axis',
+              'pituitary', 'hypothalamus', 'glandular')
+_LOW_VERBS = ('support', 'maintain', 'improve', 'enhance', 'provide')
+_PENALTY_TERMS = ('comprehensive', 'professional', 'advanced formulation')
+_SCORED_BUCKETS = (
+    ('high', _HIGH_VERBS),
+    ('bio', _BIO_TERMS),
+    ('low', _LOW_VERBS),
+    ('penalty', _PENALTY_TERMS),
+)
+
+def _build_keyword_automaton():
+    """One Aho-Corasick automaton mapping every keyword to the buckets it belongs to"""
+    buckets_by_word = {}
+    for bucket, words in (('kill', _KILL_SHOTS),) + _SCORED_BUCKETS:
+        for word in words:
+            buckets_by_word.setdefault(word, set()).add(bucket)
+    automaton = ahocorasick.Automaton()
+    for word, buckets in buckets_by_word.items():
+        automaton.add_word(word, frozenset(buckets))
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if ahocorasick is not None else None
+
+def _keyword_hits(sent_lower: str) -> set:
+    """Names of the keyword buckets that occur in a lowercased sentence"""
+    if _KEYWORD_AUTOMATON is not None:
+        hits = set()
+        for _, buckets in _KEYWORD_AUTOMATON.iter(sent_lower):
+            hits |= buckets
+        return hits
+    if any(bad in sent_lower for bad in _KILL_SHOTS):
+        return {'kill'}
+    return {bucket for bucket, words in _SCORED_BUCKETS if any(word in sent_lower for word in words)}
+
+# Applied to already-lowercased text, so no IGNORECASE
+_UNIQUE_PATTERNS = (
+    re.compile(r"(superior [\w\s]+ compared to [\w\s%]+)"),
+    re.compile(r"(99% pure [\w]+ compared to [\d]+% [\w\s]+)"),
+    re.compile(r"(only [\w\s]+ formula (?:that|to) [\w\s,]{15,80})"),
+    re.compile(r"(sets [\w\s]+ apart[^.]{10,80})"),
+    re.compile(r"(most (?:effective|potent|bioavailable) [\w\s]{10,60})"),
+)
+
+_DOSE_MAINT_RE = re.compile(r"(?:maintenance|long-term|prevention).*?(\d+[^.]{10,60}(?:daily|day|b\.?i\.?d))")
+_DOSE_ACUTE_RE = re.compile(r"(?:acute|infection|therapeutic).*?(\d+[^.]{10,60}(?:daily|day|b\.?i\.?d))")
+_DOSE_GEN_RE = re.compile(r"recommendations?:?\s*(\d+[^.]{10,60})")
+_DOSE_PATTERNS = (
+    (_DOSE_MAINT_RE, 'maintenance'),
+    (_DOSE_ACUTE_RE, 'acute'),
+    (_DOSE_GEN_RE, 'general'),
+)
+_DOSE_LEAD_RE = re.compile(r'^\s*[:\-]\s*')
+
+_CONTEXT_PATTERNS = (
+    re.compile(r"should be considered for ([\w\s,]{15,80})"),
+    re.compile(r"particularly (?:useful|effective) for ([\w\s,]{15,80})"),
+    re.compile(r"best (?:used|suited) for ([\w\s,]{15,80})"),
+)
+
 # ----------------------------- Text Processing -----------------------------
 
 def _clean_text(text: str) -> str:
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r"The U\.S\. Food and Drug Administration.*", "", text, flags=re.I | re.DOTALL)
-    return text.strip()
+    # Truncate at the FDA disclaimer first so only the kept prefix is normalized
+    text = _FDA_RE.sub('', text)
+    return ' '.join(text.split())
 
 def _split_sentences(text: str) -> List[str]:
     text = _clean_text(text)
-    abbrevs = ['Dr', 'Mr', 'Mrs', 'Ms', 'Ph', 'B', 'D', 'O', 'U', 'S', 'vs', 'etc', 'i.e', 'e.g']
-    for abbrev in abbrevs:
-        text = re.sub(rf'\b{abbrev}\.', f'{abbrev}<PERIOD>', text, flags=re.IGNORECASE)
-    sentences = re.split(r'[.!?]+', text)
+    text = _ABBREV_RE.sub(r'\1<PERIOD>', text)
     result = []
-    for sent in sentences:
-        sent = sent.replace('<PERIOD>', '.').strip()
-        if len(sent) > 20 and len(sent.split()) >= 3:
+    for match in _SENT_RUN_RE.finditer(text):
+        sent = match.group().replace('<PERIOD>', '.').strip()
+        # Whitespace is already collapsed to single spaces, so 2 spaces == 3 words
+        if len(sent) > 20 and sent.count(' ') >= 2:
             result.append(sent)
     return result
 
-def _detect_format(text: str) -> str:
-    text_lower = text.lower()
+def _detect_format(text_lower: str) -> str:
     if 'clinical guide' in text_lower or 'clinical applications:' in text_lower:
         return 'clinical_guide'
     elif 'newsletter' in text_lower or 'better health news' in text_lower:
@@ -94,20 +243,20 @@ def _extract_primary_purpose(text: str) -> Optional[str]:
     """What does this product do?"""
     
     # Pattern 1: delivers X through
-    delivers_match = re.search(r"delivers\s+([\w\s]+?)\s+(?:through|via)", text, re.IGNORECASE)
+    delivers_match = _DELIVERS_RE.search(text)
     if delivers_match:
         return delivers_match.group(1).strip()
     
     # Pattern 2: provides X for/through
-    provides_match = re.search(r"provides?\s+([\w\s]+?)\s+(?:for|through|via)", text, re.IGNORECASE)
+    provides_match = _PROVIDES_RE.search(text)
     if provides_match:
         return provides_match.group(1).strip()
     
     # Pattern 3: Clinical applications
-    app_match = re.search(r"clinical applications?:(.*?)(?:\n\n|\Z)", text, re.IGNORECASE | re.DOTALL)
+    app_match = _CLINICAL_APPS_RE.search(text)
     if app_match:
         apps_text = app_match.group(1)
-        bullets = re.findall(r'[•\-]\s*(.+?)(?:\n|$)', apps_text)
+        bullets = _BULLET_RE.findall(apps_text)
         if bullets:
             if len(bullets) >= 2:
                 return f"{bullets[0].strip()} and {bullets[1].strip()}"
@@ -118,8 +267,8 @@ def _extract_primary_purpose(text: str) -> Optional[str]:
 def _extract_key_mechanism(text: str) -> Optional[str]:
     """Find the most specific mechanism sentence"""
     
-    text_normalized = re.sub(r'\s+', ' ', text)
-    sentences = re.split(r'[.!?]+', text_normalized)
+    text_normalized = _WS_RE.sub(' ', text)
+    sentences = _SENT_SPLIT_RE.split(text_normalized)
     scored = []
     
     for sent in sentences:
@@ -128,8 +277,8 @@ def _extract_key_mechanism(text: str) -> Optional[str]:
             continue
         
         # Clean headers
-        sent_clean = re.sub(r'^(?:[A-Z][a-z]+\s+){1,4}(?=[a-z])', '', sent)
-        sent_clean = re.sub(r'^.*?\s+The\s+', 'The ', sent_clean)
+        sent_clean = _HEADER_STRIP_RE.sub('', sent)
+        sent_clean = _THE_STRIP_RE.sub('The ', sent_clean)
         
         # Capitalize if lowercase after cleaning
         if sent_clean and sent_clean[0].islower():
@@ -137,9 +286,10 @@ def _extract_key_mechanism(text: str) -> Optional[str]:
         
         sent_lower = sent_clean.lower()
         score = 0
+        hits = _keyword_hits(sent_lower)
         
         # KILL SHOTS
-        if any(bad in sent_lower for bad in ['this product is not intended', 'not intended to diagnose', 'food and drug administration', 'product specifications', 'formulation details', 'dosing protocols', 'dosing protocol', 'clinical guide', 'product profile']):
+        if 'kill' in hits:
             continue
         
         # HIGHEST value
@@ -149,19 +299,19 @@ def _extract_key_mechanism(text: str) -> Optional[str]:
             score += 4
         
         # High value: EXPANDED action verbs
-        if any(word in sent_lower for word in ['accumulate', 'block', 'prevent', 'protect', 'reduce', 'inhibit', 'modulate', 'addresses']):
+        if 'high' in hits:
             score += 3
         
         # Medium value: biological terms
-        if any(word in sent_lower for word in ['cellular', 'mitochondrial', 'oxidative', 'retinal', 'macular', 'fovea', 'pigment', 'neurotransmitter', 'enzyme', 'proteolytic', 'inflammatory', 'adrenal', 'hpa', 'axis', 'pituitary', 'hypothalamus', 'glandular']):
+        if 'bio' in hits:
             score += 2
         
         # Low value: general actions
-        if any(word in sent_lower for word in ['support', 'maintain', 'improve', 'enhance', 'provide']):
+        if 'low' in hits:
             score += 1
         
         # PENALTIES
-        if any(bad in sent_lower for bad in ['comprehensive', 'professional', 'advanced formulation']):
+        if 'penalty' in hits:
             score -= 2
         
         if sent_lower.count(':') >= 2 or sent_lower.count(',') >= 5:
@@ -179,58 +329,36 @@ def _extract_key_mechanism(text: str) -> Optional[str]:
     
     return None
 
-def _extract_unique_value(text: str) -> Optional[str]:
-    """What makes this product special?"""
-    text_lower = text.lower()
+def _extract_unique_value(text_lower: str) -> Optional[str]:
+    """What makes this product special? Expects already-lowercased text."""
     
     # Look for comparative statements
-    unique_patterns = [
-        r"(superior [\w\s]+ compared to [\w\s%]+)",
-        r"(99% pure [\w]+ compared to [\d]+% [\w\s]+)",
-        r"(only [\w\s]+ formula (?:that|to) [\w\s,]{15,80})",
-        r"(sets [\w\s]+ apart[^.]{10,80})",
-        r"(most (?:effective|potent|bioavailable) [\w\s]{10,60})",
-    ]
-    
-    for pattern in unique_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
+    for pattern in _UNIQUE_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             unique = match.group(1).strip()
-            unique = re.sub(r'\s+', ' ', unique)
+            unique = _WS_RE.sub(' ', unique)
             if unique:
                 unique = unique[0].upper() + unique[1:]
             return unique
     
     return None
 
-def _extract_usage_guidance(text: str) -> Dict[str, str]:
-    """When and how to use it"""
-    text_lower = text.lower()
+def _extract_usage_guidance(text_lower: str) -> Dict[str, str]:
+    """When and how to use it. Expects already-lowercased text."""
     guidance = {}
     
     # Dosing patterns
-    dose_patterns = [
-        (r"(?:maintenance|long-term|prevention).*?(\d+[^.]{10,60}(?:daily|day|b\.?i\.?d))", 'maintenance'),
-        (r"(?:acute|infection|therapeutic).*?(\d+[^.]{10,60}(?:daily|day|b\.?i\.?d))", 'acute'),
-        (r"recommendations?:?\s*(\d+[^.]{10,60})", 'general'),
-    ]
-    
-    for pattern, dose_type in dose_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
+    for pattern, dose_type in _DOSE_PATTERNS:
+        match = pattern.search(text_lower)
         if match and dose_type not in guidance:
             dose = match.group(1).strip()
-            dose = re.sub(r'^\s*[:\-]\s*', '', dose)
+            dose = _DOSE_LEAD_RE.sub('', dose)
             guidance[dose_type] = dose
     
     # Clinical context
-    context_patterns = [
-        r"should be considered for ([\w\s,]{15,80})",
-        r"particularly (?:useful|effective) for ([\w\s,]{15,80})",
-        r"best (?:used|suited) for ([\w\s,]{15,80})",
-    ]
-    
-    for pattern in context_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
+    for pattern in _CONTEXT_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             context = match.group(1).strip()
             guidance['context'] = context
@@ -272,6 +400,10 @@ def _build_narrative_summary(
 
 # ----------------------------- MAIN SUMMARY FUNCTION -----------------------------
 
+# make_answer results keyed by a digest of the joined text (LRU-bounded)
+_ANSWER_CACHE: "OrderedDict[bytes, dict]" = OrderedDict()
+_ANSWER_CACHE_SIZE = 256
+
 def make_answer(
     query: str,
     raw_chunks: List[str],
@@ -281,20 +413,30 @@ def make_answer(
     """Generate MI-team-focused practical summary"""
     
     all_text = " ".join(raw_chunks)
-    format_type = _detect_format(all_text)
+    
+    # Identical text always yields the same summary
+    cache_key = hashlib.blake2b(all_text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    cached = _ANSWER_CACHE.get(cache_key)
+    if cached is not None:
+        _ANSWER_CACHE.move_to_end(cache_key)
+        return {"blocks": list(cached["blocks"])}
+    
+    # Lowercase once; the format check and lowercase-only extractors share it
+    all_text_lower = all_text.lower()
+    format_type = _detect_format(all_text_lower)
     
     # Extract components
     purpose = _extract_primary_purpose(all_text)
     mechanism = _extract_key_mechanism(all_text)
-    unique_value = _extract_unique_value(all_text)
-    usage = _extract_usage_guidance(all_text)
+    unique_value = _extract_unique_value(all_text_lower)
+    usage = _extract_usage_guidance(all_text_lower)
     
     # Get clinical applications
     clinical_apps = []
-    app_match = re.search(r"clinical (?:applications?|considerations?):(.*?)(?:\n\n|\Z)", all_text, re.IGNORECASE | re.DOTALL)
+    app_match = _CLINICAL_SECTION_RE.search(all_text)
     if app_match:
         apps_text = app_match.group(1)
-        bullets = re.findall(r'[•\-]\s*(.+?)(?:\n|$)', apps_text)
+        bullets = _BULLET_RE.findall(apps_text)
         clinical_apps = [b.strip() for b in bullets[:3]]
     
     # Build practical summary
@@ -321,7 +463,7 @@ def make_answer(
         
         # Remove redundant starts if present
         if mech_clean:
-            mech_clean = re.sub(r'^(?:The combination of|The formula)\s+', '', mech_clean, flags=re.I)
+            mech_clean = _MECH_LEAD_RE.sub('', mech_clean)
         summary += f" <strong>How does it work?</strong> {mech_clean}."
     
     # KEY ADVANTAGE (what makes it special)
@@ -354,7 +496,11 @@ def make_answer(
         if usage_text:
             blocks.append(f"<div class='summary-section'><h3>Dosing</h3><p>{usage_text}</p></div>")
     
-    return {"blocks": blocks}
+    _ANSWER_CACHE[cache_key] = {"blocks": blocks}
+    if len(_ANSWER_CACHE) > _ANSWER_CACHE_SIZE:
+        _ANSWER_CACHE.popitem(last=False)
+    
+    return {"blocks": list(blocks)}
 
 # ----------------------------- Testing -----------------------------
 
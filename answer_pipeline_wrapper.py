@@ -2,69 +2,153 @@
 Wrapper around answer_pipeline to provide class-based interface
 Filters out non-product documents for cleaner summaries
 """
+import os
+import re
+import sys
 import json
-import hashlib
+import time
+import atexit
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from answer_pipeline import make_answer
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+def _read_json(path):
+    """Parse a JSON file, with orjson when available"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_json(path, data, pretty=False):
+    """Serialize data to a JSON file, with orjson when available"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2 if pretty else None)
+
+# (product -> page texts, product -> joined text) built from pages.json, keyed
+# by absolute path and validated against (mtime, size). Shared between
+# pipelines; treat as read-only.
+_PRODUCTS_CACHE = {}
+
+def _load_products(path):
+    """Group corpus page texts by product, reusing the last build if the file is unchanged"""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    entry = _PRODUCTS_CACHE.get(key)
+    if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+        return entry[2], entry[3]
+    pages = _read_json(key)
+    products = defaultdict(list)
+    for page in pages:
+        products[sys.intern(page['product'])].append(page['text'])
+    # Immutable tuples in a plain dict: no list over-allocation, and lookups
+    # of unknown names can't insert empty entries
+    products = {name: tuple(texts) for name, texts in products.items()}
+    # make_answer joins the chunks with spaces; do it once here per product
+    products_joined = {name: " ".join(texts) for name, texts in products.items()}
+    _PRODUCTS_CACHE[key] = (st.st_mtime_ns, st.st_size, products, products_joined)
+    return products, products_joined
+
+# Substrings that mark a document as something other than a product sheet
+_EXCLUDE_PATTERNS = [
+    'newsletter', 'news', 'better health',
+    'manual', 'protocol manual', 'blood chemistry',
+    'cliniciansview', 'quick reference',
+    # Full month names
+    'april', 'may', 'june', 'july', 'august', 'september', 'sept',
+    'october', 'november', 'december', 'january', 'february', 'march',
+    # Abbreviated months
+    'jan ', 'feb ', 'mar ', 'apr ', 'may ', 'jun ',
+    'jul ', 'aug ', 'sep ', 'oct ', 'nov ', 'dec ',
+    # Year patterns (dated literature)
+    ' 2022', ' 2023', ' 2024', '2022', '2023', '2024',
+    # Demo products
+    'demo',
+]
+_EXCLUDE_RE = re.compile('|'.join(re.escape(p) for p in _EXCLUDE_PATTERNS))
+_LIT_SUFFIXES = (' lit', 'lit', ' literature', ' tech lit')
+
+# Cache misses allowed to accumulate in memory before the file is rewritten,
+# and the longest a miss may wait for a save (atexit doesn't run when the
+# launchers' console is closed)
+_FLUSH_EVERY = 32
+_FLUSH_INTERVAL = 10.0
+
+def _summarize_product(item):
+    """Process-pool worker: build the summary for one (name, chunks) pair"""
+    product_name, product_texts = item
+    return make_answer(
+        query=product_name,
+        raw_chunks=product_texts,
+        product_hint=product_name
+    )
+
 class AnswerPipeline:
-    def __init__(self, cache_file="summary_cache.json"):
+    def __init__(self, cache_file="summary_cache.json", pretty_cache=False):
         self.cache_file = cache_file
+        self.pretty_cache = pretty_cache
         self.cache = self._load_cache()
+        self._dirty = False
+        self._writes_since_flush = 0
+        self._last_save = float('-inf')  # nothing saved yet this session
+        atexit.register(self.flush)
+        
+        # Product lookup built from the corpus pages (the page list itself isn't kept)
+        self.products, self.products_joined = _load_products('corpus/index/pages.json')
+        
+        # Names superseded by a "<name> (1)" variant of the same document
+        self._has_variant_with_1 = {p for p in self.products if f"{p} (1)" in self.products}
         
-        # Load product pages from corpus
-        with open('corpus/index/pages.json', 'r') as f:
-            self.pages = json.load(f)
-        
-        # Create product lookup
-        self.products = {}
-        for page in self.pages:
-            product = page['product']
-            if product not in self.products:
-                self.products[product] = []
-            self.products[product].append(page['text'])
+        # Product list is fixed once the corpus is loaded; keep it and a
+        # lowercased copy (same order) for the app's search filter
+        self._product_list = [p for p in sorted(self.products) if self._is_product_doc(p)]
+        self._product_list_lower = [p.lower() for p in self._product_list]
     
     def _load_cache(self):
         """Load existing cache"""
         try:
-            with open(self.cache_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            return _read_json(self.cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):  # orjson's error subclasses it
             return {}
     
     def _save_cache(self):
-        """Save cache to disk"""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f, indent=2)
+        """Save cache to disk (atomically, via a temp file)"""
+        tmp_file = self.cache_file + '.tmp'
+        _write_json(tmp_file, self.cache, pretty=self.pretty_cache)
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
+        self._writes_since_flush = 0
+        self._last_save = time.monotonic()
+    
+    def flush(self):
+        """Write pending cache entries to disk, if any"""
+        if self._dirty:
+            self._save_cache()
     
     def _get_cache_key(self, product_name):
-        """Generate cache key for a product"""
-        return hashlib.md5(product_name.encode()).hexdigest()
+        """Generate cache key for a product (the name itself keeps the cache readable)"""
+        return product_name
     
     def _is_product_doc(self, product_name: str) -> bool:
         """Determine if this is an actual product vs newsletter/manual/duplicate."""
         name_lower = product_name.lower()
         
-        # Exclude newsletters and manuals
-        exclude_patterns = [
-            'newsletter', 'news', 'better health',
-            'manual', 'protocol manual', 'blood chemistry',
-            'cliniciansview', 'quick reference',
-            # Full month names
-            'april', 'may', 'june', 'july', 'august', 'september', 'sept',
-            'october', 'november', 'december', 'january', 'february', 'march',
-            # Abbreviated months
-            'jan ', 'feb ', 'mar ', 'apr ', 'may ', 'jun ', 
-            'jul ', 'aug ', 'sep ', 'oct ', 'nov ', 'dec ',
-            # Year patterns (dated literature)
-            ' 2022', ' 2023', ' 2024', '2022', '2023', '2024'
-        ]
-        
-        if any(pattern in name_lower for pattern in exclude_patterns):
+        # Exclude newsletters, manuals, dated literature and demo products
+        if _EXCLUDE_RE.search(name_lower):
             return False
         
         # Exclude literature files and duplicates
-        if any(name_lower.endswith(suffix) for suffix in [' lit', 'lit', ' literature', ' tech lit']):
+        if name_lower.endswith(_LIT_SUFFIXES):
             if not product_name.isupper():  # Keep uppercase versions
                 return False
         
@@ -72,24 +156,19 @@ class AnswerPipeline:
         if product_name and product_name[0].islower():
             return False
         
-        # Exclude demo products
-        if 'demo' in name_lower:
-            return False
-        
-        
         # Exclude duplicates if (1) version exists
-        version_with_1 = f"{product_name} (1)"
-        if version_with_1 in self.products and product_name != version_with_1:
+        if product_name in self._has_variant_with_1:
             return False
         
         return True
 
     def get_product_list(self):
         """Get list of actual products (excludes newsletters/manuals)"""
-        all_products = sorted(self.products.keys())
-        # Filter to only actual products
-        products = [p for p in all_products if self._is_product_doc(p)]
-        return products
+        return list(self._product_list)
+    
+    def get_product_list_lower(self):
+        """Lowercased product names, index-aligned with get_product_list() (read-only)"""
+        return self._product_list_lower
     
     def get_all_items(self):
         """Get everything including newsletters/manuals"""
@@ -108,20 +187,49 @@ class AnswerPipeline:
         if product_name not in self.products:
             return f"No data found for {product_name}"
         
-        # Get all text for this product
-        product_texts = self.products[product_name]
-        
-        # Generate summary
+        # Generate summary from the pre-joined text (joining one chunk is free)
         result = make_answer(
             query=product_name,
-            raw_chunks=product_texts,
+            raw_chunks=[self.products_joined[product_name]],
             product_hint=product_name
         )
         
-        # Cache it
+        # Cache it; the file is rewritten every _FLUSH_EVERY misses, whenever
+        # the last save is over _FLUSH_INTERVAL seconds old, and at exit
         self.cache[cache_key] = result
-        self._save_cache()
+        self._dirty = True
+        self._writes_since_flush += 1
+        if (self._writes_since_flush >= _FLUSH_EVERY
+                or time.monotonic() - self._last_save >= _FLUSH_INTERVAL):
+            self._save_cache()
         
         # Return formatted summary
         blocks = result.get('blocks', [])
         return ' '.join(blocks)
+    
+    def warm_cache(self, names=None, max_workers=None):
+        """Generate summaries for all uncached products in parallel, then save once"""
+        if names is None:
+            names = self.get_product_list()
+        
+        # Skip cached, unknown and repeated names
+        pending = []
+        seen = set()
+        for name in names:
+            if name in seen or name not in self.products:
+                continue
+            seen.add(name)
+            if self._get_cache_key(name) not in self.cache:
+                pending.append(name)
+        
+        if not pending:
+            return 0
+        
+        items = [(name, [self.products_joined[name]]) for name in pending]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_summarize_product, items))
+        
+        for name, result in zip(pending, results):
+            self.cache[self._get_cache_key(name)] = result
+        self._save_cache()
+        return len(pending)
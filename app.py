@@ -1,6 +1,7 @@
 import streamlit as st
-import json
 import sys
+from collections import deque
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
 
@@ -18,9 +19,9 @@ st.set_page_config(page_title="Zorex Knowledge Dashboard", layout="wide", initia
 if 'dark_mode' not in st.session_state:
     st.session_state.dark_mode = False
 if 'recently_viewed' not in st.session_state:
-    st.session_state.recently_viewed = []
+    st.session_state.recently_viewed = deque(maxlen=5)
 if 'qa_history' not in st.session_state:
-    st.session_state.qa_history = []
+    st.session_state.qa_history = deque(maxlen=10)
 
 # Dark mode toggle in sidebar
 with st.sidebar:
@@ -109,7 +110,9 @@ with tab1:
                 
                 # Filter products based on search
                 if search_term:
-                    filtered_products = [p for p in all_products if search_term.lower() in p.lower()]
+                    term = search_term.lower()
+                    filtered_products = [all_products[i] for i, name_lower
+                                         in enumerate(pipeline.get_product_list_lower()) if term in name_lower]
                     if not filtered_products:
                         st.warning(f"No products found matching '{search_term}'")
                         filtered_products = all_products
@@ -134,10 +137,11 @@ with tab1:
             # Display summary when button clicked
             if search_button and selected_product:
                 # Add to recently viewed (keep last 5 unique)
-                if selected_product in st.session_state.recently_viewed:
+                try:
                     st.session_state.recently_viewed.remove(selected_product)
-                st.session_state.recently_viewed.insert(0, selected_product)
-                st.session_state.recently_viewed = st.session_state.recently_viewed[:5]
+                except ValueError:
+                    pass
+                st.session_state.recently_viewed.appendleft(selected_product)
                 
                 with st.spinner('Generating summary...'):
                     try:
@@ -157,6 +161,10 @@ with tab1:
                         
                         st.success("✅ Summary generated successfully!")
                         
+                        # Persist new summaries now; closing the launcher's
+                        # console kills the app without running atexit
+                        pipeline.flush()
+                        
                     except Exception as e:
                         st.error(f"Error generating summary: {str(e)}")
     
@@ -173,6 +181,12 @@ with tab2:
     def load_qa_system():
         return ResourcesQA()
     
+    # Repeated questions (e.g. the example buttons) skip the search entirely;
+    # the leading underscore keeps Streamlit from hashing the QA singleton
+    @st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+    def cached_search(question, k, _qa):
+        return _qa.search(question, max_results=k)
+    
     try:
         qa = load_qa_system()
         
@@ -193,15 +207,14 @@ with tab2:
         # Perform search
         if search_qa and question:
             # Add to Q&A history
-            st.session_state.qa_history.insert(0, {
+            st.session_state.qa_history.appendleft({
                 'question': question,
                 'timestamp': datetime.now().strftime("%I:%M %p"),
                 'result_count': 0
             })
-            st.session_state.qa_history = st.session_state.qa_history[:10]
             
             with st.spinner('Searching manuals...'):
-                results = qa.search(question, max_results=num_results)
+                results = cached_search(question, num_results, qa)
                 
                 # Update result count
                 if st.session_state.qa_history:
@@ -252,15 +265,8 @@ with tab2:
         
         # Show available manuals
         with st.expander("📚 Available Manuals"):
-            manuals = {}
-            for page in qa.index:
-                file = page['file']
-                if file not in manuals:
-                    manuals[file] = 0
-                manuals[file] += 1
-            
             col_a, col_b = st.columns(2)
-            for idx, (manual, page_count) in enumerate(sorted(manuals.items())):
+            for idx, (manual, page_count) in enumerate(sorted(qa.manual_page_counts.items())):
                 with col_a if idx % 2 == 0 else col_b:
                     st.markdown(f"📄 **{manual.replace('.pdf', '')}** ({page_count} pages)")
                 
@@ -281,9 +287,8 @@ with st.sidebar:
         st.metric("Products Indexed", "N/A")
     
     try:
-        with open('manuals_index.json', 'r') as f:
-            manual_pages = len(json.load(f))
-        st.metric("Manual Pages Indexed", manual_pages)
+        qa = load_qa_system()
+        st.metric("Manual Pages Indexed", qa.num_pages)
     except:
         st.metric("Manual Pages Indexed", "N/A")
     
@@ -299,7 +304,7 @@ with st.sidebar:
     if st.session_state.qa_history:
         st.markdown("---")
         st.markdown("### 🔍 Recent Searches")
-        for i, search in enumerate(st.session_state.qa_history[:5]):
+        for i, search in enumerate(islice(st.session_state.qa_history, 5)):
             st.caption(f"**{search['timestamp']}** - {search['question'][:40]}... ({search['result_count']} results)")
     
     st.markdown("---")
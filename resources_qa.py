@@ -1,73 +1,271 @@
 import json
+import os
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
 import re
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+                         'of', 'with', 'is', 'are', 'was', 'were', 'what', 'how', 'why', 'when',
+                         'where', 'who', 'which', 'do', 'does', 'did', 'can', 'could', 'should'})
+_TOKEN_RE = re.compile(r'\b\w+\b')
+_SENT_RE = re.compile(r'[.!?]+')
+
+# Keyword hits handed to the semantic re-ranker when one is enabled
+_SEMANTIC_CANDIDATES = 50
+# Recent query embeddings kept for reuse, and how close a new question must be
+_SEMANTIC_CACHE_SIZE = 512
+_SEMANTIC_CACHE_THRESHOLD = 0.92
+
+
+@lru_cache(maxsize=256)
+def _highlight_pattern(keywords):
+    """Compiled case-insensitive alternation of all highlight keywords"""
+    # Longest first so "vitamins" wins over "vitamin" at the same position
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    return re.compile('|'.join(map(re.escape, ordered)), re.IGNORECASE)
+
 
 class ResourcesQA:
-    def __init__(self, index_path="manuals_index.json"):
-        """Load the manuals index"""
-        with open(index_path, 'r') as f:
-            self.index = json.load(f)
+    def __init__(self, index_path="manuals_index.json", semantic_model=None):
+        """Load the manuals index
+        
+        semantic_model optionally names a sentence-transformers model
+        (e.g. 'all-MiniLM-L6-v2') used to re-rank keyword hits.
+        """
+        if orjson is not None:
+            self.index = orjson.loads(Path(index_path).read_bytes())
+        else:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        
+        # Per-page normalized forms, indexed like self.index, so searches
+        # don't re-lowercase or re-split the whole corpus on every query
+        self.pages_lower = [page['text'].lower() for page in self.index]
+        self.pages_words = [page['text'].split() for page in self.index]
+        # Sentences for snippet scoring, stripped and lowercased once
+        self.pages_sentences, self.pages_sentences_lower = [], []
+        for page in self.index:
+            sentences = _SENT_RE.split(page['text'])
+            self.pages_sentences.append([sent.strip() for sent in sentences])
+            self.pages_sentences_lower.append([sent.lower() for sent in sentences])
+        # Char offset of each word as if the words were single-space joined
+        # (plus the end), for mapping a keyword hit back to its word index
+        self.pages_offsets = [np.cumsum([0] + [len(w) + 1 for w in words], dtype=np.int32)
+                              for words in self.pages_words]
+        self._build_tf_matrix()
+        
+        # Index-wide stats for the dashboard, so it never re-walks the pages
+        self.num_pages = len(self.index)
+        self.manual_page_counts = Counter(page['file'] for page in self.index)
+        
+        # Optional semantic re-ranking; keyword-only unless a model is named
+        self.model = None
+        self.page_emb = None
+        if semantic_model:
+            self._load_semantic_model(semantic_model, Path(index_path))
+        if self.model is not None:
+            # Ring buffer of (query embedding, max_results, results)
+            self._sem_cache_embs = np.zeros((_SEMANTIC_CACHE_SIZE, self.page_emb.shape[1]), dtype=np.float32)
+            self._sem_cache_k = np.full(_SEMANTIC_CACHE_SIZE, -1, dtype=np.int64)
+            self._sem_cache_results = [None] * _SEMANTIC_CACHE_SIZE
+            self._sem_cache_next = 0
+            self._sem_cache_count = 0
+            # The instance is shared across Streamlit sessions (cache_resource)
+            self._sem_cache_lock = threading.Lock()
         print(f"✅ Loaded {len(self.index)} manual pages")
     
+    def _load_semantic_model(self, model_name, index_path):
+        """Load the sentence-transformers model and page embeddings (cached beside the index)"""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:  # heavy optional dependency, imported only on request
+            print("⚠️ sentence-transformers not installed; using keyword search only")
+            return
+        
+        self.model = SentenceTransformer(model_name)
+        
+        # Reuse saved embeddings unless the index is newer or has changed size;
+        # a missing or unreadable (e.g. truncated) file just gets re-encoded
+        emb_path = index_path.with_name(f"{index_path.stem}.{model_name.replace('/', '_')}.emb.npy")
+        try:
+            if emb_path.stat().st_mtime >= index_path.stat().st_mtime:
+                page_emb = np.load(emb_path)
+                if page_emb.shape[0] == self.num_pages:
+                    self.page_emb = page_emb
+                    return
+        except (OSError, ValueError, EOFError):
+            pass
+        
+        self.page_emb = self.model.encode([page['text'] for page in self.index],
+                                          normalize_embeddings=True, batch_size=64).astype(np.float32)
+        
+        # Save atomically, via a temp file, like the summary cache
+        tmp_path = emb_path.with_name(emb_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:  # file object, so np.save doesn't append .npy
+            np.save(f, self.page_emb)
+        os.replace(tmp_path, emb_path)
+    
+    def _encode_query(self, question):
+        """Unit-length float32 embedding of the question"""
+        return self.model.encode([question], normalize_embeddings=True)[0].astype(np.float32)
+    
+    def _build_tf_matrix(self):
+        """Build the page x token term-frequency matrix over the lowercased pages"""
+        self.vocab = {}
+        rows, cols, data = [], [], []
+        for i, text_lower in enumerate(self.pages_lower):
+            for token, tf in Counter(_TOKEN_RE.findall(text_lower)).items():
+                rows.append(i)
+                cols.append(self.vocab.setdefault(token, len(self.vocab)))
+                data.append(tf)
+        # CSC so pulling the handful of query columns is cheap
+        self.tf = sp.csc_matrix((data, (rows, cols)),
+                                shape=(len(self.index), len(self.vocab)), dtype=np.int16)
+        
+        # Vocab in column order as one newline-joined string plus each token's
+        # start offset, so keyword lookups scan it in C instead of a dict loop
+        tokens = list(self.vocab)
+        self._vocab_blob = '\n'.join(tokens)
+        self._vocab_starts = np.cumsum([0] + [len(t) + 1 for t in tokens[:-1]], dtype=np.int64)
+    
+    def _keyword_weights(self, keywords):
+        """Per vocab column, how many keyword hits one occurrence of that token holds"""
+        # Keywords are pure \w runs, so a match can never straddle two tokens:
+        # weighting every token that contains a keyword by token.count(keyword)
+        # reproduces text_lower.count(keyword) exactly, substrings included.
+        # One scan of the newline-joined vocab per keyword finds those tokens.
+        weights = np.zeros(len(self.vocab), dtype=np.int64)
+        for keyword in keywords:
+            hits = np.fromiter((m.start() for m in re.finditer(re.escape(keyword), self._vocab_blob)),
+                               dtype=np.int64)
+            if len(hits):
+                cols = np.searchsorted(self._vocab_starts, hits, side='right') - 1
+                weights += np.bincount(cols, minlength=len(weights))
+        return weights
+    
     def search(self, question, max_results=5):
         """Simple keyword-based search that returns relevant pages with citations"""
         # Extract keywords from question
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-                      'of', 'with', 'is', 'are', 'was', 'were', 'what', 'how', 'why', 'when',
-                      'where', 'who', 'which', 'do', 'does', 'did', 'can', 'could', 'should'}
-        
         question_lower = question.lower()
-        keywords = [word for word in re.findall(r'\b\w+\b', question_lower) 
-                   if word not in stop_words and len(word) > 2]
+        keywords = [word for word in _TOKEN_RE.findall(question_lower) 
+                   if word not in _STOP_WORDS and len(word) > 2]
         
         if not keywords:
             return []
         
-        # Score each page based on keyword matches
-        results = []
-        for page in self.index:
-            text_lower = page['text'].lower()
-            score = 0
-            
-            # Count keyword occurrences
-            for keyword in keywords:
-                score += text_lower.count(keyword)
-            
-            if score > 0:
-                # Extract relevant snippet
-                snippet = self._extract_relevant_snippet(page['text'], keywords)
-                
-                # Get contextual excerpt (better than full page)
-                context = self._extract_context(page['text'], keywords)
-                
-                results.append({
-                    'file': page['file'],
-                    'page': page['page'],
-                    'text': page['text'],
-                    'snippet': snippet,
-                    'context': context,
-                    'keywords': keywords,
-                    'score': score
-                })
-        
-        # Sort by score and return top results
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:max_results]
-    
-    def _extract_relevant_snippet(self, text, keywords, max_words=80):
-        """Extract a relevant snippet containing keywords"""
-        sentences = re.split(r'[.!?]+', text)
+        if self.model is None:
+            ranked = self._score_pages(keywords, max_results)
+            return [self._hydrate(i, keywords, score) for score, i in ranked]
         
+        # Near-duplicate of a recent question: reuse its results outright
+        query_emb = self._encode_query(question)
+        cached = self._semantic_cache_get(query_emb, max_results)
+        if cached is not None:
+            return cached
+        
+        candidates = self._score_pages(keywords, max(max_results, _SEMANTIC_CANDIDATES))
+        ranked = self._rerank(query_emb, candidates, max_results)
+        results = [self._hydrate(i, keywords, score) for score, i in ranked]
+        self._semantic_cache_put(query_emb, max_results, results)
+        return list(results)
+    
+    def _semantic_cache_get(self, query_emb, max_results):
+        """Cached results of the most similar past question with the same max_results, if close enough"""
+        with self._sem_cache_lock:
+            n = self._sem_cache_count
+            if not n:
+                return None
+            sims = self._sem_cache_embs[:n] @ query_emb
+            sims[self._sem_cache_k[:n] != max_results] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < _SEMANTIC_CACHE_THRESHOLD:
+                return None
+            return list(self._sem_cache_results[best])
+    
+    def _semantic_cache_put(self, query_emb, max_results, results):
+        """Store results in the next ring-buffer slot, overwriting the oldest once full"""
+        with self._sem_cache_lock:
+            slot = self._sem_cache_next
+            self._sem_cache_embs[slot] = query_emb
+            self._sem_cache_k[slot] = max_results
+            self._sem_cache_results[slot] = results
+            self._sem_cache_next = (slot + 1) % _SEMANTIC_CACHE_SIZE
+            self._sem_cache_count = min(self._sem_cache_count + 1, _SEMANTIC_CACHE_SIZE)
+    
+    def _rerank(self, query_emb, candidates, max_results):
+        """Re-order (score, page_idx) candidates by 0.5 * keyword score (max-normalized) + 0.5 * cosine"""
+        if not candidates:
+            return []
+        
+        page_ids = np.array([i for _, i in candidates])
+        keyword_scores = np.array([score for score, _ in candidates], dtype=np.float32)
+        sims = self.page_emb[page_ids] @ query_emb
+        combined = 0.5 * keyword_scores / keyword_scores.max() + 0.5 * sims
+        
+        # Stable, so equal blends keep their keyword ranking
+        order = np.argsort(-combined, kind='stable')
+        return [candidates[j] for j in order[:max_results]]
+    
+    def _score_pages(self, keywords, max_results):
+        """Top (score, page_idx) pairs by keyword hits, ties in page order"""
+        weights = self._keyword_weights(keywords)
+        cols = np.flatnonzero(weights)
+        if not len(cols):
+            return []
+        
+        # Score every page in one sparse mat-vec
+        hits = weights[cols]
+        scores = self.tf[:, cols] @ hits
+        
+        # Partition down to the pages at or above the K-th score before ordering
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > max_results > 0:
+            kth = np.partition(scores[candidates], -max_results)[-max_results]
+            candidates = candidates[scores[candidates] >= kth]
+        top = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [(int(scores[i]), int(i)) for i in top[:max_results]]
+    
+    def _hydrate(self, i, keywords, score):
+        """Build the full result dict for page i"""
+        page = self.index[i]
+        
+        # Extract relevant snippet
+        snippet = self._extract_relevant_snippet(i, keywords)
+        
+        # Get contextual excerpt (better than full page)
+        context = self._extract_context(i, keywords)
+        
+        return {
+            'file': page['file'],
+            'page': page['page'],
+            'text': page['text'],
+            'snippet': snippet,
+            'context': context,
+            'keywords': keywords,
+            'score': score
+        }
+    
+    def _extract_relevant_snippet(self, i, keywords, max_words=80):
+        """Extract a relevant snippet containing keywords from page i"""
         # Find sentences containing keywords
         scored_sentences = []
-        for sent in sentences:
-            sent_lower = sent.lower()
+        for sent, sent_lower in zip(self.pages_sentences[i], self.pages_sentences_lower[i]):
             score = sum(sent_lower.count(kw) for kw in keywords)
             if score > 0:
-                scored_sentences.append((score, sent.strip()))
+                scored_sentences.append((score, sent))
         
         if not scored_sentences:
-            words = text.split()[:max_words]
+            words = self.pages_words[i][:max_words]
             return ' '.join(words) + '...'
         
         # Get best sentence
@@ -80,73 +278,59 @@ class ResourcesQA:
             return ' '.join(words[:max_words]) + '...'
         
         # Add more sentences if we have room
-        snippet = best_sentence
+        parts = [best_sentence]
         word_count = len(words)
         
-        for i in range(1, min(3, len(scored_sentences))):
-            next_sent = scored_sentences[i][1]
+        for j in range(1, min(3, len(scored_sentences))):
+            next_sent = scored_sentences[j][1]
             next_words = len(next_sent.split())
             if word_count + next_words <= max_words:
-                snippet += ' ' + next_sent
+                parts.append(next_sent)
                 word_count += next_words
             else:
                 break
         
-        return snippet
+        return ' '.join(parts)
     
-    def _extract_context(self, text, keywords, context_words=200):
-        """Extract contextual excerpt around keywords (not full page)"""
-        # Find first keyword position
-        text_lower = text.lower()
-        first_kw_pos = float('inf')
+    def _extract_context(self, i, keywords, context_words=200):
+        """Extract contextual excerpt around keywords (not full page) of page i"""
+        text_lower = self.pages_lower[i]
+        words = self.pages_words[i]
+        
+        # Find first keyword position; once one keyword has hit, later ones
+        # only need to search the text before that hit
+        first_kw_pos = -1
         
         for kw in keywords:
-            pos = text_lower.find(kw)
-            if pos != -1 and pos < first_kw_pos:
+            end = len(text_lower) if first_kw_pos == -1 else first_kw_pos + len(kw) - 1
+            pos = text_lower.find(kw, 0, end)
+            if pos != -1:
                 first_kw_pos = pos
         
-        if first_kw_pos == float('inf'):
+        if first_kw_pos == -1:
             # No keywords found, return beginning
-            words = text.split()[:context_words]
-            return ' '.join(words) + '...'
-        
-        # Get words before and after
-        words = text.split()
-        word_positions = []
-        current_pos = 0
+            return ' '.join(words[:context_words]) + '...'
         
-        for i, word in enumerate(words):
-            word_positions.append((i, current_pos))
-            current_pos += len(word) + 1
-        
-        # Find word index at first keyword
-        kw_word_idx = 0
-        for i, pos in word_positions:
-            if pos >= first_kw_pos:
-                kw_word_idx = i
-                break
+        # Find word index at first keyword: first word starting at or after it
+        kw_word_idx = int(np.searchsorted(self.pages_offsets[i][:-1], first_kw_pos))
+        if kw_word_idx == len(words):
+            kw_word_idx = 0
         
         # Extract context window
         start_idx = max(0, kw_word_idx - 100)
         end_idx = min(len(words), kw_word_idx + 100)
         
-        context = ' '.join(words[start_idx:end_idx])
-        
-        if start_idx > 0:
-            context = '...' + context
-        if end_idx < len(words):
-            context = context + '...'
-        
-        return context
+        return ''.join(['...' if start_idx > 0 else '',
+                        ' '.join(words[start_idx:end_idx]),
+                        '...' if end_idx < len(words) else ''])
     
     def highlight_keywords(self, text, keywords):
         """Highlight keywords in text for better scanning"""
-        highlighted = text
-        for kw in keywords:
-            # Case-insensitive replacement with markdown bold
-            pattern = re.compile(re.escape(kw), re.IGNORECASE)
-            highlighted = pattern.sub(lambda m: f"**{m.group(0)}**", highlighted)
-        return highlighted
+        if not keywords:
+            return text
+        # Case-insensitive replacement with markdown bold, one pass for all keywords
+        pattern = _highlight_pattern(tuple(keywords))
+        return pattern.sub(lambda m: f"**{m.group(0)}**", text)
     
     def format_answer(self, question, results):
         """Format search results into a readable answer with citations"""
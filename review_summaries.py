@@ -1,54 +1,71 @@
 from answer_pipeline_wrapper import AnswerPipeline
 import re
 
-pipeline = AnswerPipeline()
-products = pipeline.get_product_list()
+# One scan per summary picks up every labelled field (first hit per label)
+_FIELD_RE = re.compile(r'<strong>(Primary indications|Mechanism|Key advantage):</strong> ([^<]+)')
+_HEADER_LEAK_RE = re.compile(r'^[A-Z][a-z]+\s+[A-Z][a-z]+\s+[A-Z]')
 
-print("="*80)
-print("SUMMARY QUALITY REVIEW - ALL PRODUCTS")
-print("="*80)
-print(f"\nTotal products: {len(products)}\n")
-
-for i, product in enumerate(products, 1):
-    summary = pipeline.get_cached_summary(product)
-    
-    # Extract components
-    indications = re.search(r'<strong>Primary indications:</strong> ([^<]+)', summary)
-    mechanism = re.search(r'<strong>Mechanism:</strong> ([^<]+)', summary)
-    advantage = re.search(r'<strong>Key advantage:</strong> ([^<]+)', summary)
+def main():
+    pipeline = AnswerPipeline()
+    products = pipeline.get_product_list()
     
-    print(f"\n[{i}/{len(products)}] {product}")
-    print("-" * 80)
+    # Summaries are CPU-bound, so generate any missing ones across processes
+    # up front; the loop below then only reads from the cache
+    pipeline.warm_cache(products)
     
-    if indications:
-        ind_text = indications.group(1).strip()
-        print(f"✓ Indications: {ind_text[:100]}{'...' if len(ind_text) > 100 else ''}")
-    else:
-        print("✗ Indications: MISSING")
+    print("="*80)
+    print("SUMMARY QUALITY REVIEW - ALL PRODUCTS")
+    print("="*80)
+    print(f"\nTotal products: {len(products)}\n")
     
-    if mechanism:
-        mech_text = mechanism.group(1).strip()
-        # Flag potential issues
-        issues = []
-        if len(mech_text.split()) < 8:
-            issues.append("TOO SHORT")
-        if re.match(r'^[A-Z][a-z]+\s+[A-Z][a-z]+\s+[A-Z]', mech_text):
-            issues.append("HEADER LEAK")
-        if not mech_text[0].isupper():
-            issues.append("LOWERCASE START")
+    for i, product in enumerate(products, 1):
+        summary = pipeline.get_cached_summary(product)
+        
+        # Extract components
+        fields = {}
+        for m in _FIELD_RE.finditer(summary):
+            fields.setdefault(m.group(1), m.group(2))
+        indications = fields.get('Primary indications')
+        mechanism = fields.get('Mechanism')
+        advantage = fields.get('Key advantage')
+        
+        print(f"\n[{i}/{len(products)}] {product}")
+        print("-" * 80)
         
-        status = "⚠️" if issues else "✓"
-        flag = f" [{', '.join(issues)}]" if issues else ""
-        print(f"{status} Mechanism: {mech_text[:100]}{'...' if len(mech_text) > 100 else ''}{flag}")
-    else:
-        print("✗ Mechanism: MISSING")
+        if indications:
+            ind_text = indications.strip()
+            print(f"✓ Indications: {ind_text[:100]}{'...' if len(ind_text) > 100 else ''}")
+        else:
+            print("✗ Indications: MISSING")
+        
+        if mechanism:
+            mech_text = mechanism.strip()
+            # Flag potential issues
+            issues = []
+            if len(mech_text.split()) < 8:
+                issues.append("TOO SHORT")
+            if _HEADER_LEAK_RE.match(mech_text):
+                issues.append("HEADER LEAK")
+            if not mech_text[0].isupper():
+                issues.append("LOWERCASE START")
+            
+            status = "⚠️" if issues else "✓"
+            flag = f" [{', '.join(issues)}]" if issues else ""
+            print(f"{status} Mechanism: {mech_text[:100]}{'...' if len(mech_text) > 100 else ''}{flag}")
+        else:
+            print("✗ Mechanism: MISSING")
+        
+        if advantage:
+            adv_text = advantage.strip()
+            print(f"✓ Advantage: {adv_text[:100]}{'...' if len(adv_text) > 100 else ''}")
+        else:
+            print("  (No advantage)")
     
-    if advantage:
-        adv_text = advantage.group(1).strip()
-        print(f"✓ Advantage: {adv_text[:100]}{'...' if len(adv_text) > 100 else ''}")
-    else:
-        print("  (No advantage)")
+    print("\n" + "="*80)
+    print("Review complete. Look for ✗ (missing) and ⚠️ (issues) markers.")
+    print("="*80)
+
 
-print("\n" + "="*80)
-print("Review complete. Look for ✗ (missing) and ⚠️ (issues) markers.")
-print("="*80)
+# Guarded so process-pool workers (spawned on macOS/Windows) can import this safely
+if __name__ == "__main__":
+    main()